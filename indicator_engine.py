@@ -1,34 +1,187 @@
+import json
+import logging
+import os
+import numpy as np
 import pandas as pd
-import ta
+from numba import njit
+
+logger = logging.getLogger(__name__)
+
+# Backend ATR : "numba" (défaut) ou "ta" (repli, librairie importée seulement dans ce cas)
+ATR_BACKEND_ENV = "ROBOT_ATR_BACKEND"
+_ta = None
+
+
+def _get_ta():
+    """Import paresseux de la librairie ta (chemin de repli uniquement)."""
+    global _ta
+    if _ta is None:
+        import ta
+        _ta = ta
+    return _ta
+
+
+# Pas de signature explicite : une signature float32[:] n'accepte que des tableaux
+# modifiables, or to_numpy(copy=False) renvoie une vue en lecture seule sous
+# pandas copy-on-write (défaut en 3.0). Numba spécialise au premier appel (warm-up).
+@njit(cache=True, fastmath=True)
+def _wilder_atr(high, low, close, n):
+    """
+    ATR de Wilder en une seule passe sur des tableaux bruts (float32, comme les prix).
+    Même convention que ta.volatility.AverageTrueRange :
+    - TR[0] = high - low (pas de clôture précédente)
+    - ATR[n-1] = moyenne des n premiers TR
+    - ATR[t] = (ATR[t-1] * (n-1) + TR[t]) / n
+    Les n-1 premières valeurs restent à 0.
+    """
+    size = high.shape[0]
+    out = np.zeros(size, dtype=np.float32)
+    if size < n:
+        return out
+
+    acc = 0.0
+    for i in range(size):
+        if i == 0:
+            tr = high[0] - low[0]
+        else:
+            tr = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+
+        if i < n:
+            acc += tr
+            if i == n - 1:
+                out[i] = acc / n
+        else:
+            out[i] = (out[i - 1] * (n - 1) + tr) / n
+    return out
+
+
+@njit(cache=True, fastmath=True)
+def _wilder_atr_tail(high, low, close, prev_close, prev_atr, n):
+    """
+    Prolonge un ATR de Wilder déjà connu sur les seules nouvelles bougies.
+    prev_close / prev_atr = état de la dernière bougie déjà calculée.
+    """
+    size = high.shape[0]
+    out = np.empty(size, dtype=np.float32)
+    atr = prev_atr
+    pc = prev_close
+    for i in range(size):
+        tr = max(high[i] - low[i], abs(high[i] - pc), abs(low[i] - pc))
+        atr = (atr * (n - 1) + tr) / n
+        out[i] = atr
+        pc = close[i]
+    return out
+
 
 class IndicatorEngine:
     """
     Moteur d'indicateurs simplifié (Operation Clean Slate).
     Seul l'ATR est conservé pour le calcul du risque (SL/TP).
     """
+    ATR_PERIOD = 14
+
     def __init__(self):
-        pass
-        
-    def add_indicators(self, data_dict):
+        # Cache ATR par symbole : {symbol: (timestamp, atr, close)}
+        # = état de la dernière bougie CLÔTURÉE (iloc[-2]) au cycle précédent.
+        self._atr_cache = {}
+
+        # Seul point de contrôle : en cas d'échec du JIT on bascule sur ta ici,
+        # pas à chaque calcul dans la boucle de trading.
+        self.use_numba = os.environ.get(ATR_BACKEND_ENV, "numba").lower() != "ta"
+        if self.use_numba:
+            try:
+                # Warm-up JIT : compilation payée ici, pas dans la boucle de trading.
+                # _compute_atr reçoit des vues en lecture seule (pandas copy-on-write)
+                # ou modifiables selon la version de pandas : on compile les deux variantes.
+                writable = np.ones(self.ATR_PERIOD + 1, dtype=np.float32)
+                readonly = writable.copy()
+                readonly.setflags(write=False)
+                for dummy in (readonly, writable):
+                    _wilder_atr(dummy, dummy, dummy, self.ATR_PERIOD)
+                    _wilder_atr_tail(dummy, dummy, dummy, 1.0, 1.0, self.ATR_PERIOD)
+            except Exception as e:
+                logger.error("Erreur JIT ATR (%s), repli sur la librairie ta.", e)
+                self.use_numba = False
+        if not self.use_numba:
+            _get_ta()
+
+    def load_cache(self, path):
+        """Recharge le cache ATR sauvegardé (démarrage à chaud)."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            for sym, (ts, atr, close) in data.items():
+                self._atr_cache[sym] = (pd.Timestamp(ts), float(atr), float(close))
+        except Exception as e:
+            logger.error("Erreur Load Cache ATR: %s", e)
+
+    def save_cache(self, path):
+        """Sauvegarde le cache ATR sur disque (appelé à l'arrêt)."""
+        try:
+            data = {sym: [ts.isoformat(), atr, close] for sym, (ts, atr, close) in self._atr_cache.items()}
+            with open(path, 'w') as f:
+                json.dump(data, f)
+        except Exception as e:
+            logger.error("Erreur Save Cache ATR: %s", e)
+
+    def _compute_atr(self, df, symbol):
+        """
+        Calcule la colonne ATR. Si le symbole est en cache, que sa bougie est
+        toujours présente et que le DataFrame fusionné par MarketDataHandler porte
+        déjà l'ATR du cycle précédent, ces valeurs sont conservées et seules les
+        bougies suivantes sont calculées : la série reste complète.
+        Sinon recalcul complet. Avec le backend ta : toujours recalcul complet.
+        """
+        n = self.ATR_PERIOD
+        if not self.use_numba:
+            indicator_atr = _get_ta().volatility.AverageTrueRange(
+                high=df['high'], low=df['low'], close=df['close'], window=n
+            )
+            return indicator_atr.average_true_range().to_numpy()
+
+        high = df['high'].to_numpy(dtype=np.float32, copy=False)
+        low = df['low'].to_numpy(dtype=np.float32, copy=False)
+        close = df['close'].to_numpy(dtype=np.float32, copy=False)
+
+        atr = None
+        cached = self._atr_cache.get(symbol) if symbol is not None else None
+        if cached is not None:
+            ts, last_atr, last_close = cached
+            pos = df.index.searchsorted(ts)
+            if pos < len(df) - 1 and df.index[pos] == ts and 'ATR' in df.columns:
+                # Copie modifiable : les bougies du tail fusionné sont NaN à ce stade
+                prev = np.array(df['ATR'].to_numpy(), dtype=np.float32)
+                if not np.isnan(prev[pos]):
+                    atr = prev
+                    atr[pos + 1:] = _wilder_atr_tail(high[pos + 1:], low[pos + 1:], close[pos + 1:],
+                                                     last_close, last_atr, n)
+        if atr is None:
+            atr = _wilder_atr(high, low, close, n)
+
+        # On mémorise la dernière bougie clôturée (la bougie en cours bouge encore)
+        if symbol is not None and len(df) > n:
+            self._atr_cache[symbol] = (df.index[-2], float(atr[-2]), float(close[-2]))
+        return atr
+
+    def add_indicators(self, data_dict, symbol=None):
         """
-        Ajoute l'ATR aux données M5.
+        Ajoute l'ATR aux données M5 et attache les 3 dernières bougies (df.attrs['tail3_ohlc']).
+        symbol (optionnel) active le calcul incrémental entre deux cycles.
         """
         if 'M5' not in data_dict:
             return data_dict
-            
+
         df = data_dict['M5']
         if df.empty:
             return data_dict
-            
-        # ATR Calculation (Period 14)
-        try:
-            # Check if ta library is available, otherwise manual calculation
-            indicator_atr = ta.volatility.AverageTrueRange(
-                high=df['high'], low=df['low'], close=df['close'], window=14
-            )
-            df['ATR'] = indicator_atr.average_true_range()
-        except Exception as e:
-            print(f"Erreur Calcul ATR: {e}")
-            
+
+        # ATR Calculation (Period 14) - Wilder via Numba
+        df['ATR'] = self._compute_atr(df, symbol)
+        # 3 dernières bougies OHLC en ndarray (3, 4) : la validation Power Trigger de
+        # TradeExecutor les lit directement, sans passer par l'indexation pandas
+        df.attrs['tail3_ohlc'] = df.iloc[-3:][['open', 'high', 'low', 'close']].to_numpy()
+
         data_dict['M5'] = df
         return data_dict
@@ -1,9 +1,18 @@
 import time
 import os
-import winsound # Bibliothèque standard Windows pour le son
 import MetaTrader5 as mt5
+import numpy as np
 import json
-from datetime import datetime, timedelta, timezone
+import re
+import sys
+import heapq
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 
 # Importation des modules
 try:
@@ -15,6 +24,13 @@ except ImportError as e:
     print(f"Erreur d'importation des modules : {e}")
     exit(1)
 
+logger = logging.getLogger(__name__)
+
+# Constantes MT5 résolues une seule fois
+_BUY = mt5.ORDER_TYPE_BUY
+_SELL = mt5.ORDER_TYPE_SELL
+_SLTP = mt5.TRADE_ACTION_SLTP
+
 # --- Configuration Colors ---
 class Col:
     GREEN = '\033[92m' # Pour BUY
@@ -30,95 +46,135 @@ DRY_RUN = False
 MAX_DAILY_LOSS = -550.0 
 COOLDOWN_HOURS = 2 
 MAX_OPEN_POSITIONS = 30 
+ANALYSIS_WORKERS = 16 # Threads d'analyse (appels MT5 = IO, le GIL est relâché)
 MEMORY_FILE = "bot_memory.json"
+ATR_CACHE_FILE = "atr_cache.json"
 cooldowns = {} 
+_cooldown_heap = [] # (expiry, symbol) : miroir trié de cooldowns pour l'expiration
+_alert_lock = threading.Lock() # Pas de bips superposés si deux signaux se suivent
+_memory = {} # Contenu complet de MEMORY_FILE, chargé une fois au démarrage
+
+# --- FILTRE FOREX ONLY (LISTE NOIRE) ---
+BLACKLIST = [
+    "XAU", "GOLD",      # Or
+    "XAG", "SILVER",    # Argent
+    "OIL", "WTI", "BRENT", "XTI", "XBR", "USOIL", "UKOIL", # Pétrole
+    "BTC", "ETH", "LTC", "XRP", "CRYPTO", "BITCOIN", # Cryptos
+    "DX", "DXY", "USDX", # Dollar Index
+    "US30", "US100", "DE30", "DE40", "FR40", "SPX", "NAS" # Indices
+]
+BLACKLIST_RE = re.compile('|'.join(map(re.escape, BLACKLIST)))
+_symbols_cache = (None, []) # (noms visibles, symboles filtrés) du dernier cycle
 
-def manage_break_even():
+def manage_break_even(positions):
     """
     V7.4 : Sécurisation automatique (Break-Even).
     Logic : Si TP1 est fermé, on met les autres à BE.
+    positions : résultat de mt5.positions_get() du cycle courant.
     """
-    positions = mt5.positions_get()
-    if positions is None: return
+    if not positions: return
     
-    grouped = {}
+    # Un seul passage : symboles dont le TP1 est encore ouvert + positions TP2/TP3 à sécuriser
+    tp1_open = set()
+    others = defaultdict(list)
     for pos in positions:
         if pos.magic < 123000: continue 
         
-        sym = pos.symbol
-        if sym not in grouped: grouped[sym] = {'TP1': False, 'Others': []}
-        
         comment = pos.comment
         if "TP1" in comment: # Generic matching for robust handling
-            grouped[sym]['TP1'] = True
+            tp1_open.add(pos.symbol)
         elif "TP2" in comment or "TP3" in comment:
-            grouped[sym]['Others'].append(pos)
+            others[pos.symbol].append(pos)
             
     # Apply Logic
-    for sym, data in grouped.items():
-        if not data['TP1'] and data['Others']:
-            for pos in data['Others']:
-                if pos.type == mt5.ORDER_TYPE_BUY:
-                     if pos.sl < pos.price_open: 
-                         print(f"[BE MANAGER] Securing BUY {sym} (Ticket {pos.ticket}) -> Move SL to {pos.price_open}")
-                         request = {
-                             "action": mt5.TRADE_ACTION_SLTP,
-                             "position": pos.ticket,
-                             "sl": pos.price_open,
-                             "tp": pos.tp
-                         }
-                         mt5.order_send(request)
-                elif pos.type == mt5.ORDER_TYPE_SELL:
-                     if pos.sl > pos.price_open or pos.sl == 0.0: 
-                         print(f"[BE MANAGER] Securing SELL {sym} (Ticket {pos.ticket}) -> Move SL to {pos.price_open}")
-                         request = {
-                             "action": mt5.TRADE_ACTION_SLTP,
-                             "position": pos.ticket,
-                             "sl": pos.price_open,
-                             "tp": pos.tp
-                         }
-                         mt5.order_send(request)
+    for sym, sym_positions in others.items():
+        if sym in tp1_open: continue
+        for pos in sym_positions:
+            if pos.type == _BUY:
+                 if pos.sl < pos.price_open: 
+                     logger.info("[BE MANAGER] Securing BUY %s (Ticket %s) -> Move SL to %s", sym, pos.ticket, pos.price_open)
+                     request = {
+                         "action": _SLTP,
+                         "position": pos.ticket,
+                         "sl": pos.price_open,
+                         "tp": pos.tp
+                     }
+                     mt5.order_send(request)
+            elif pos.type == _SELL:
+                 if pos.sl > pos.price_open or pos.sl == 0.0: 
+                     logger.info("[BE MANAGER] Securing SELL %s (Ticket %s) -> Move SL to %s", sym, pos.ticket, pos.price_open)
+                     request = {
+                         "action": _SLTP,
+                         "position": pos.ticket,
+                         "sl": pos.price_open,
+                         "tp": pos.tp
+                     }
+                     mt5.order_send(request)
+
+def set_cooldown(symbol, expiry):
+    """Active (ou prolonge) le cooldown d'un symbole."""
+    cooldowns[symbol] = expiry
+    heapq.heappush(_cooldown_heap, (expiry, symbol))
+
+def pop_expired_cooldowns(now):
+    """
+    Retire et retourne les symboles dont le cooldown est terminé.
+    Les entrées obsolètes du tas (cooldown prolongé depuis) sont ignorées.
+    """
+    expired = []
+    while _cooldown_heap and _cooldown_heap[0][0] < now:
+        exp, s = heapq.heappop(_cooldown_heap)
+        if cooldowns.get(s) == exp:
+            del cooldowns[s]
+            expired.append(s)
+    return expired
 
 def load_memory():
     """Charge la mémoire (dont les cooldowns)"""
-    global cooldowns
+    global cooldowns, _memory
     if os.path.exists(MEMORY_FILE):
         try:
             with open(MEMORY_FILE, 'r') as f:
-                data = json.load(f)
-                saved_cds = data.get("cooldowns", {})
+                _memory = json.load(f)
+                saved_cds = _memory.get("cooldowns", {})
                 for sym, expiry_str in saved_cds.items():
-                    cooldowns[sym] = datetime.fromisoformat(expiry_str)
+                    set_cooldown(sym, datetime.fromisoformat(expiry_str))
         except Exception as e:
-            print(f"Erreur Load Memory: {e}")
+            logger.error("Erreur Load Memory: %s", e)
 
 def save_memory_cooldowns():
-    """Sauvegarde les cooldowns"""
+    """Sauvegarde les cooldowns (réécriture atomique, sans relire le fichier)"""
     try:
-        data = {}
-        if os.path.exists(MEMORY_FILE):
-            with open(MEMORY_FILE, 'r') as f:
-                data = json.load(f)
-        
-        serializable_cds = {sym: dt.isoformat() for sym, dt in cooldowns.items()}
-        data["cooldowns"] = serializable_cds
+        _memory["cooldowns"] = {sym: dt.isoformat() for sym, dt in cooldowns.items()}
         
-        with open(MEMORY_FILE, 'w') as f:
-            json.dump(data, f)
+        tmp_path = MEMORY_FILE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(_memory, f, separators=(',', ':'))
+        os.replace(tmp_path, MEMORY_FILE)
     except Exception as e:
-        print(f"Erreur Save Memory: {e}")
+        logger.error("Erreur Save Memory: %s", e)
+
+# Champs des deals utilisés pour le PnL (une passe Python, puis tout en NumPy)
+_DEAL_DTYPE = np.dtype([
+    ('magic', np.int64), ('profit', np.float64), ('commission', np.float64),
+    ('swap', np.float64), ('symbol', 'U32'), ('entry', np.int32)
+])
+
+def _deals_to_array(deals):
+    """Convertit le tuple de DealInfo MT5 en tableau structuré NumPy."""
+    return np.array([(d.magic, d.profit, d.commission, d.swap, d.symbol, d.entry) for d in deals],
+                    dtype=_DEAL_DTYPE)
 
 def get_daily_pnl():
     """Calcule le PnL réalisé depuis minuit."""
     now = datetime.now()
     today_beginning = now.replace(hour=0, minute=0, second=0, microsecond=0)
     deals = mt5.history_deals_get(today_beginning, now)
-    total_profit = 0.0
-    if deals:
-        for deal in deals:
-            if deal.magic == MAGIC_NUMBER: 
-                total_profit += deal.profit + deal.commission + deal.swap
-    return total_profit
+    if not deals:
+        return 0.0
+    arr = _deals_to_array(deals)
+    net = arr['profit'] + arr['commission'] + arr['swap']
+    return float(net[arr['magic'] == MAGIC_NUMBER].sum())
 
 def check_recent_losses():
     """Scanne l'historique récent pour détecter les pertes et activer les cooldowns."""
@@ -128,48 +184,104 @@ def check_recent_losses():
     deals = mt5.history_deals_get(check_start, now)
     updated = False
     if deals:
-        for deal in deals:
-            if deal.magic == MAGIC_NUMBER and deal.entry == mt5.DEAL_ENTRY_OUT:
-                profit = deal.profit + deal.commission + deal.swap
-                symbol = deal.symbol
-                if profit < 0:
-                    if symbol not in cooldowns:
-                         print(f"🚫 PERTE DÉTECTÉE sur {symbol} ({profit:.2f}). Activation COOLDOWN 2H.")
-                         expiry = now + timedelta(hours=COOLDOWN_HOURS)
-                         cooldowns[symbol] = expiry
-                         updated = True
+        arr = _deals_to_array(deals)
+        net = arr['profit'] + arr['commission'] + arr['swap']
+        losses = (arr['magic'] == MAGIC_NUMBER) & (arr['entry'] == mt5.DEAL_ENTRY_OUT) & (net < 0)
+        for symbol, profit in zip(arr['symbol'][losses], net[losses]):
+            symbol = str(symbol)
+            if symbol not in cooldowns:
+                 logger.warning("🚫 PERTE DÉTECTÉE sur %s (%.2f). Activation COOLDOWN 2H.", symbol, profit)
+                 set_cooldown(symbol, now + timedelta(hours=COOLDOWN_HOURS))
+                 updated = True
     if updated:
         save_memory_cooldowns()
 
 def play_alert(signal_type):
     try:
-        if signal_type == 'BUY':
-            for _ in range(3):
-                winsound.Beep(1000, 500) 
-                time.sleep(0.1)
-        elif signal_type == 'SELL':
-            for _ in range(3):
-                winsound.Beep(500, 500)
-                time.sleep(0.1)
+        with _alert_lock:
+            _beep(signal_type)
     except Exception as e:
-        print(f"Erreur Alerte Sonore : {e}")
+        logger.error("Erreur Alerte Sonore : %s", e)
 
-def count_open_positions(symbol):
-    positions = mt5.positions_get(symbol=symbol)
-    if positions is None: return 0
-    count = 0
-    for pos in positions:
-        if pos.magic == MAGIC_NUMBER:
-            count += 1
-    return count
+def play_alert_async(signal_type):
+    """Joue l'alerte en arrière-plan pour ne pas bloquer l'envoi des ordres."""
+    threading.Thread(target=play_alert, args=(signal_type,), daemon=True).start()
+
+def _beep(signal_type):
+    import winsound # Bibliothèque standard Windows pour le son (importée au premier signal)
+    if signal_type == 'BUY':
+        for _ in range(3):
+            winsound.Beep(1000, 500) 
+            time.sleep(0.1)
+    elif signal_type == 'SELL':
+        for _ in range(3):
+            winsound.Beep(500, 500)
+            time.sleep(0.1)
+
+def filter_symbols(all_symbols_info):
+    """
+    Garde les symboles visibles dans le Market Watch et hors liste noire.
+    Le résultat est mémorisé : si le Market Watch n'a pas changé, pas de re-filtrage.
+    """
+    global _symbols_cache
+    if not all_symbols_info:
+        return []
+
+    visible = tuple(s.name for s in all_symbols_info if s.visible)
+    if visible == _symbols_cache[0]:
+        return _symbols_cache[1]
+
+    symbols_to_trade = [name for name in visible if not BLACKLIST_RE.search(name.upper())]
+    _symbols_cache = (visible, symbols_to_trade)
+    return symbols_to_trade
+
+def _analyze_one(symbol, handler, engine, generator, total_positions):
+    """
+    Analyse d'un symbole éligible (exécutée dans un thread du pool).
+    total_positions : nombre de positions ouvertes relevé une fois en début de cycle.
+    Retourne (signal, data) ou None si rien à faire. Aucun ordre n'est envoyé ici.
+    """
+    data = handler.get_multi_timeframe_data(symbol)
+    if not data:
+        return None
+
+    # 1. Indicators (ATR Only)
+    data = engine.add_indicators(data, symbol)
+
+    # 2. Strategy (Pure Fibonacci)
+    # Note: check_signal now handles everything (Swings, Fibs, Zone)
+    signal = 'NEUTRAL'
+
+    if total_positions < MAX_OPEN_POSITIONS:
+         signal = generator.check_signal(data, symbol)
+
+    return signal, data
+
+def start_logging():
+    """
+    Tous les modules (main compris) journalisent via logging : les messages passent
+    par une seule file et sont écrits sur stdout par un thread dédié (QueueListener),
+    dans l'ordre des appels. La boucle de trading ne bloque jamais sur l'écriture console.
+    """
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, console)
+    listener.start()
+    return listener
 
 def run_bot():
     os.system('') 
-    print(f"{Col.YELLOW}--- Démarrage du Robot Pure Fibonacci V8.0 ---{Col.RESET}")
-    print("Mode: REAL TRADING (Fibonacci Retracement + S/R).")
+    listener = start_logging()
+    logger.info("%s--- Démarrage du Robot Pure Fibonacci V8.0 ---%s", Col.YELLOW, Col.RESET)
+    logger.info("Mode: REAL TRADING (Fibonacci Retracement + S/R).")
     
     if not mt5.initialize():
-        print(f"Échec de l'initialisation MT5: {mt5.last_error()}")
+        logger.error("Échec de l'initialisation MT5: %s", mt5.last_error())
+        listener.stop()
         return
 
     handler = MarketDataHandler()
@@ -178,129 +290,121 @@ def run_bot():
     executor = TradeExecutor()
     
     load_memory()
-    print(f"Mémoire chargée. Cooldowns actifs: {list(cooldowns.keys())}")
+    engine.load_cache(ATR_CACHE_FILE)
+    executor.start_hwm_poller()
+    logger.info("Mémoire chargée. Cooldowns actifs: %s", list(cooldowns.keys()))
+    
+    pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
     
     try:
         while True:
-            print(f"\n{Col.YELLOW}--- Analyse : {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---{Col.RESET}")
+            logger.info("\n%s--- Analyse : %s ---%s", Col.YELLOW, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), Col.RESET)
+            
+            # Un seul appel MT5 pour toutes les positions du cycle
+            all_positions = mt5.positions_get() or []
+            pos_count = Counter(p.symbol for p in all_positions if p.magic == MAGIC_NUMBER)
             
             try:
-                manage_break_even()
+                manage_break_even(all_positions)
             except Exception as e_be:
-                print(f"Erreur BE Manager: {e_be}")
+                logger.error("Erreur BE Manager: %s", e_be)
             
-            all_symbols_info = mt5.symbols_get()
-            symbols_to_trade = []
-            # --- FILTRE FOREX ONLY (LISTE NOIRE) ---
-            blacklist = [
-                "XAU", "GOLD",      # Or
-                "XAG", "SILVER",    # Argent
-                "OIL", "WTI", "BRENT", "XTI", "XBR", "USOIL", "UKOIL", # Pétrole
-                "BTC", "ETH", "LTC", "XRP", "CRYPTO", "BITCOIN", # Cryptos
-                "DX", "DXY", "USDX", # Dollar Index
-                "US30", "US100", "DE30", "DE40", "FR40", "SPX", "NAS" # Indices
-            ]
-
-            symbols_to_trade = []
-            if all_symbols_info:
-                for s in all_symbols_info:
-                    # 1. Doit être visible dans le Market Watch
-                    if not s.visible:
-                        continue
-                    
-                    # 2. Ne doit PAS contenir un mot interdit
-                    name_upper = s.name.upper()
-                    is_clean = True
-                    for bad_word in blacklist:
-                        if bad_word in name_upper:
-                            is_clean = False
-                            break
-                    
-                    # 3. Si c'est propre (Forex), on ajoute
-                    if is_clean:
-                        symbols_to_trade.append(s.name)
-            # -------------------------------------------------------
-            
-            if symbols_to_trade:
-                print(f"Marchés surveillés ({len(symbols_to_trade)}): {symbols_to_trade[:5]} ...")
-            else:
-                print("Aucun symbole visible ! Attente...")
-                time.sleep(60)
-                continue
-
             daily_pnl = get_daily_pnl()
-            print(f"PnL Journalier : {daily_pnl:.2f} USD")
+            logger.info("PnL Journalier : %.2f USD", daily_pnl)
             
-            stop_trading_today = False
-            if daily_pnl < MAX_DAILY_LOSS:
-                print(f"{Col.RED}🛑 Perte Max Journalière atteinte. Trading suspendu.{Col.RESET}")
-                stop_trading_today = True
+            stop_trading_today = daily_pnl < MAX_DAILY_LOSS
             
             check_recent_losses()
             
-            now = datetime.now()
-            expired = [s for s, t in cooldowns.items() if now > t]
+            expired = pop_expired_cooldowns(datetime.now())
             for s in expired:
-                print(f"✅ Fin de Cooldown pour {s}.")
-                del cooldowns[s]
+                logger.info("✅ Fin de Cooldown pour %s.", s)
             if expired: save_memory_cooldowns()
 
-            for symbol in symbols_to_trade:
+            # Aucune analyse n'est exploitable si le trading est suspendu
+            if stop_trading_today:
+                logger.warning("%s🛑 Perte Max Journalière atteinte. Trading suspendu.%s", Col.RED, Col.RESET)
+                time.sleep(60)
+                continue
+
+            symbols_to_trade = filter_symbols(mt5.symbols_get())
+            
+            if symbols_to_trade:
+                logger.info("Marchés surveillés (%d): %s ...", len(symbols_to_trade), symbols_to_trade[:5])
+            else:
+                logger.warning("Aucun symbole visible ! Attente...")
+                time.sleep(60)
+                continue
+
+            # Symboles analysables : ni en cooldown, ni déjà en position
+            eligible = [s for s in symbols_to_trade if s not in cooldowns and pos_count.get(s, 0) == 0]
+
+            futures = {
+                pool.submit(_analyze_one, symbol, handler, engine, generator, len(all_positions)): symbol
+                for symbol in eligible
+            }
+
+            # Collecte des signaux au fil des analyses
+            signals = [] # (symbol, signal, signal_type, data)
+            for future in as_completed(futures):
+                symbol = futures[future]
                 try:
-                    if symbol in cooldowns and not stop_trading_today:
-                        continue
-                
-                    open_trades = count_open_positions(symbol)
-                    if open_trades > 0:
-                        continue
-                        
-                    data = handler.get_multi_timeframe_data(symbol)
-                    if not data:
+                    result = future.result()
+                    if result is None:
                         continue
-                     
-                    total_positions = mt5.positions_total()
-                    if total_positions >= MAX_OPEN_POSITIONS:
-                         pass
+                    signal, data = result
 
-                    # 1. Indicators (ATR Only)
-                    data = engine.add_indicators(data)
-                    
-                    # 2. Strategy (Pure Fibonacci)
-                    # Note: check_signal now handles everything (Swings, Fibs, Zone)
-                    signal = 'NEUTRAL'
-                    
-                    can_trade = (not stop_trading_today) and (total_positions < MAX_OPEN_POSITIONS)
-                    
-                    if can_trade:
-                         signal = generator.check_signal(data, symbol)
-                    
-                    # 3. Execution
                     signal_type = signal
                     if isinstance(signal, dict):
                         signal_type = signal.get('action', 'NEUTRAL')
                     
-                    if signal_type == 'BUY':
-                        print(f"{Col.GREEN}!!! SIGNAL BUY (FIBO) SUR {symbol} !!!{Col.RESET}")
-                        play_alert('BUY')
-                        executor.execute_trade(symbol, signal, data, dry_run=DRY_RUN)
+                    if signal_type in ('BUY', 'SELL'):
+                        signals.append((symbol, signal, signal_type, data))
                         
-                    elif signal_type == 'SELL':
-                        print(f"{Col.RED}!!! SIGNAL SELL (FIBO) SUR {symbol} !!!{Col.RESET}")
-                        play_alert('SELL')
-                        executor.execute_trade(symbol, signal, data, dry_run=DRY_RUN)
+                except Exception as e_inner:
+                    logger.error("[%s] Erreur interne : %s", symbol, e_inner)
+                    continue
+
+            # 3. Execution (un symbole à la fois ; les 4 ordres d'un trade partent en parallèle si CONCURRENT_ORDERS)
+            # Power Trigger validé pour tous les signaux du cycle en une passe
+            momentum = executor.validate_momentum_batch(
+                [sig[0] for sig in signals], [sig[2] for sig in signals],
+                {sig[0]: sig[3] for sig in signals}
+            )
+            # Compte + infos des symboles signalés : capturés une seule fois pour le cycle
+            snapshot = executor.build_snapshot([sig[0] for sig in signals]) if signals else None
+            for (symbol, signal, signal_type, data), momentum_ok in zip(signals, momentum):
+                try:
+                    # Limite de positions relue avant chaque trade : les trades précédents du cycle comptent
+                    if mt5.positions_total() >= MAX_OPEN_POSITIONS:
+                        logger.warning("Limite de positions atteinte (%d). Signaux restants ignorés.", MAX_OPEN_POSITIONS)
+                        break
+
+                    if signal_type == 'BUY':
+                        logger.info("%s!!! SIGNAL BUY (FIBO) SUR %s !!!%s", Col.GREEN, symbol, Col.RESET)
+                    else:
+                        logger.info("%s!!! SIGNAL SELL (FIBO) SUR %s !!!%s", Col.RED, symbol, Col.RESET)
+                    play_alert_async(signal_type)
+                    executor.execute_trade(symbol, signal, data, snapshot=snapshot, dry_run=DRY_RUN,
+                                           momentum_ok=bool(momentum_ok))
                         
                 except Exception as e_inner:
-                    print(f"[{symbol}] Erreur interne : {e_inner}")
+                    logger.error("[%s] Erreur interne : %s", symbol, e_inner)
                     continue
 
-            print("Fin du cycle. Attente 60 secondes...")
+            logger.info("Fin du cycle. Attente 60 secondes...")
             time.sleep(60)
 
     except KeyboardInterrupt:
-        print("\nArrêt manuel.")
+        logger.info("\nArrêt manuel.")
     finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        engine.save_cache(ATR_CACHE_FILE)
+        executor.stop_hwm_poller()
+        executor.shutdown_order_pool()
         mt5.shutdown()
-        print("Fin du programme.")
+        logger.info("Fin du programme.")
+        listener.stop() # Vide la file : à faire après le dernier message
 
 if __name__ == "__main__":
     run_bot()
@@ -1,8 +1,15 @@
+import logging
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
-from datetime import datetime
+
+logger = logging.getLogger(__name__)
 
 class MarketDataHandler:
+    HISTORY_BARS = 1000 # Profondeur d'historique conservée par timeframe
+    TAIL_BARS = 8       # Bougies rechargées à chaque cycle une fois le cache rempli
+    COLUMNS = ('open', 'high', 'low', 'close') # Seules colonnes utilisées en aval (ATR / Fibonacci)
+
     def __init__(self, login=None, password=None, server=None):
         """
         Initialise la connexion à MetaTrader 5.
@@ -23,6 +30,31 @@ class MarketDataHandler:
         if not authorized:
             raise Exception(f"MT5 initialization failed: {mt5.last_error()}")
 
+        # Cache {(symbol, tf_name): DataFrame} : seules les dernières bougies sont re-téléchargées
+        self._cache = {}
+
+    def _rates_to_df(self, rates):
+        """Convertit le tableau structuré MT5 en DataFrame indexé par le temps."""
+        # Colonnes prises directement dans le tableau structuré (pas d'inférence pandas)
+        # Prix en float32 : ~7 chiffres significatifs, largement suffisant pour le Forex
+        # MT5 renvoie 'time' en int64 (secondes Unix) : simple réinterpretation, sans copie
+        t = rates['time']
+        t = t.view('datetime64[s]') if t.dtype == np.int64 else t.astype('datetime64[s]')
+        time_idx = pd.DatetimeIndex(t, name='time')
+        return pd.DataFrame({k: rates[k].astype(np.float32) for k in self.COLUMNS}, index=time_idx)
+
+    def _merge_tail(self, cached, tail):
+        """
+        Fusionne les dernières bougies avec le cache.
+        La bougie en cours (même timestamp) est remplacée par sa version récente.
+        Retourne None s'il y a un trou entre le cache et les nouvelles bougies.
+        """
+        if tail.index[0] > cached.index[-1]:
+            return None
+        pos = cached.index.searchsorted(tail.index[0])
+        start = max(0, pos + len(tail) - self.HISTORY_BARS)
+        return pd.concat([cached.iloc[start:pos], tail])
+
     def get_multi_timeframe_data(self, symbol):
         """
         Récupère les données OHLCV pour les timeframes H4, H1 et M5.
@@ -44,33 +76,42 @@ class MarketDataHandler:
         try:
             # Assurer que le symbole est visible
             if not mt5.symbol_select(symbol, True):
-                print(f"Symbole {symbol} non trouvé dans le Market Watch.")
+                logger.warning("Symbole %s non trouvé dans le Market Watch.", symbol)
                 return {}
 
             for tf_name, tf_constant in timeframes.items():
-                rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, 1000)
+                key = (symbol, tf_name)
+                cached = self._cache.get(key)
+                count = self.TAIL_BARS if cached is not None else self.HISTORY_BARS
+                rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, count)
                 
                 if rates is None or len(rates) == 0:
-                    print(f"Erreur de récupération des données pour {symbol} {tf_name}")
+                    logger.error("Erreur de récupération des données pour %s %s", symbol, tf_name)
                     continue
                 
-                # Conversion brute en DataFrame
-                df = pd.DataFrame(rates)
-                
-                # Conversion de la colonne 'time' (unix timestamp) en datetime
-                df['time'] = pd.to_datetime(df['time'], unit='s')
+                df = self._rates_to_df(rates)
                 
-                # Définir l'index
-                df.set_index('time', inplace=True)
+                if cached is not None:
+                    merged = self._merge_tail(cached, df)
+                    if merged is None:
+                        # Trop de bougies manquées depuis le dernier cycle : rechargement complet
+                        rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, self.HISTORY_BARS)
+                        if rates is None or len(rates) == 0:
+                            logger.error("Erreur de récupération des données pour %s %s", symbol, tf_name)
+                            continue
+                        merged = self._rates_to_df(rates)
+                    df = merged
                 
+                self._cache[key] = df
                 final_data[tf_name] = df
                 
         except Exception as e:
-            print(f"Une erreur est survenue lors de la récupération des données : {e}")
+            logger.error("Une erreur est survenue lors de la récupération des données : %s", e)
             
         return final_data
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     try:
         # Initialisation sans arguments (utilise le terminal ouvert)
         handler = MarketDataHandler()
@@ -1,6 +1,63 @@
-from datetime import datetime
-import pandas as pd
+import logging
 import numpy as np
+from numba import njit
+
+logger = logging.getLogger(__name__)
+
+# Niveaux de Fibonacci (ratios du range de l'impulsion)
+_FIB_MID, _FIB_GOLD, _FIB_EXT = 0.5, 0.618, 0.272
+
+
+@njit(cache=True, fastmath=True)
+def _check_signal_numeric(high, low, close, atr):
+    """
+    Coeur numérique du signal (compilé) : Swings + Fibonacci + Golden Zone.
+    high/low/close = fenêtre de lookback, atr = dernière valeur d'ATR (0 si absente).
+    Retourne (action_code, tp1, tp2, sl, fib_50, fib_618) avec action_code
+    +1 = BUY, -1 = SELL, 0 = NEUTRAL.
+    """
+    # 1. Identify Swings (The Range) : Max/Min global de la fenêtre (1ère occurrence)
+    hi = 0
+    li = 0
+    for i in range(1, high.shape[0]):
+        if high[i] > high[hi]:
+            hi = i
+        if low[i] < low[li]:
+            li = i
+    h_price = float(high[hi])
+    l_price = float(low[li])
+
+    # 2. direction = +1 : Low -> High (Impulsion UP), retracement DOWN attendu -> Buy Dip.
+    #    direction = -1 : High -> Low (Impulsion DOWN), retracement UP attendu -> Sell Rally.
+    direction = 0
+    if hi > li:
+        direction = 1
+    elif li > hi:
+        direction = -1
+    if direction == 0:
+        return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+
+    # Fibs mesurés depuis la fin de l'impulsion (anchor = 0.0), origine = 1.0
+    r = h_price - l_price
+    anchor = h_price if direction > 0 else l_price
+    origin = l_price if direction > 0 else h_price
+    fib_50 = anchor - direction * _FIB_MID * r
+    fib_618 = anchor - direction * _FIB_GOLD * r
+
+    # 3. Golden Zone (0.5 - 0.618) : on considère la zone elle-même comme S/R (V8.0 "Pure")
+    current_close = float(close[-1])
+    if not (min(fib_50, fib_618) <= current_close <= max(fib_50, fib_618)):
+        return 0, 0.0, 0.0, 0.0, fib_50, fib_618
+
+    # TP1: Retour à l'extrême (0.0). TP2: Extension 0.272 au-delà.
+    tp1 = anchor
+    tp2 = anchor + direction * _FIB_EXT * r
+
+    # SL: Derrière le niveau 1.0 (origine de l'impulsion) - 1.5 ATR.
+    if atr == 0:
+        atr = r * 0.05 # Fallback
+    sl = origin - direction * 1.5 * atr
+    return direction, tp1, tp2, sl, fib_50, fib_618
 
 class SignalGenerator:
     """
@@ -18,27 +75,18 @@ class SignalGenerator:
         # We need "established" swings. 
         # For live trading, defining a swing usually needs N candles AFTER the peak.
         # But for retracement, we look at the LAST significant High/Low.
+        # Mémo par symbole : {symbol: (timestamp dernière bougie M5, résultat)}
+        # Le signal ne change qu'à l'apparition d'une nouvelle bougie.
+        self._last = {}
 
-    def _find_swings(self, df, period=100):
-        """
-        Trouve le dernier Swing High et Swing Low majeurs sur la période donnée.
-        Retourne: (high_idx, high_price, low_idx, low_price)
-        """
-        if len(df) < period:
-            period = len(df)
-            
-        subset = df.iloc[-period:].copy()
-        
-        # Simple Max/Min approach for "impulsion"
-        # We want the Global Max and Global Min of the recent window to define the range.
-        
-        max_idx = subset['high'].idxmax()
-        min_idx = subset['low'].idxmin()
-        
-        max_price = subset.loc[max_idx, 'high']
-        min_price = subset.loc[min_idx, 'low']
-        
-        return max_idx, max_price, min_idx, min_price
+        # Warm-up JIT : compilation payée ici, pas dans la boucle de trading.
+        # _evaluate_golden_zone reçoit des vues en lecture seule (pandas copy-on-write)
+        # ou modifiables selon la version de pandas : on compile les deux variantes.
+        writable = np.ones(self.lookback_period, dtype=np.float32)
+        readonly = writable.copy()
+        readonly.setflags(write=False)
+        for dummy in (readonly, writable):
+            _check_signal_numeric(dummy, dummy, dummy, 0.0)
 
     def check_signal(self, data_dict, symbol, geo_signal=None):
         """
@@ -54,111 +102,38 @@ class SignalGenerator:
         if df.empty or len(df) < 50:
             return 'NEUTRAL'
             
-        # 1. Identify Swings (The Range)
-        h_idx, h_price, l_idx, l_price = self._find_swings(df, period=100)
-        
-        # Current Price
-        current_close = df.iloc[-1]['close']
-        
-        # 2. Determine Trend & Fib Setup
-        # Compare timestamps to see which is more recent.
-        # Assuming index is Datetime or monotonic.
-        
-        # Case A: Low is Older than High -> Impulsion UP (Low -> High). Retracement Down expected.
-        # Trend: BULLISH (locally). 
-        # WAIT. Actually, if Low -> High is the move, we are correcting DOWN.
-        # Strategy: Buy Dip at Golden Zone.
+        key = df.index[-1]
+        cached = self._last.get(symbol)
+        if cached and cached[0] == key:
+            return cached[1]
         
-        # Case B: High is Older than Low -> Impulsion DOWN (High -> Low). Retracement Up expected.
-        # Strategy: Sell Rally at Golden Zone.
+        result = self._evaluate_golden_zone(df, symbol)
+        self._last[symbol] = (key, result)
+        return result
+
+    def _evaluate_golden_zone(self, df, symbol):
+        """
+        Calcul effectif du signal sur le DataFrame M5 (délégué à _check_signal_numeric).
+        Retourne 'NEUTRAL' ou le dict du signal.
+        """
+        period = self.lookback_period
+        high = df['high'].to_numpy(dtype=np.float32, copy=False)[-period:]
+        low = df['low'].to_numpy(dtype=np.float32, copy=False)[-period:]
+        close = df['close'].to_numpy(dtype=np.float32, copy=False)[-period:]
+        atr_col = df['ATR'].values if 'ATR' in df.columns else None
+        atr = atr_col[-1] if atr_col is not None else 0.0
         
-        is_bullish_impulse = h_idx > l_idx # Max is more recent than Min
-        is_bearish_impulse = l_idx > h_idx # Min is more recent than Max
+        action, tp1, tp2, sl, fib_50, fib_618 = _check_signal_numeric(high, low, close, float(atr))
+        if action == 0:
+            return 'NEUTRAL'
         
-        signal = 'NEUTRAL'
-        tps = []
+        label = "Bullish Dip" if action > 0 else "Bearish Rally"
+        logger.info("[FIBONACCI] %s in GOLDEN ZONE (%s). P=%.5f [50%%:%.5f | 618%%:%.5f]",
+                    symbol, label, close[-1], fib_50, fib_618)
         
-        if is_bullish_impulse:
-            # RANGE: Low (0.0 equiv? No, Fibs usually: Start=1.0, End=0.0. Retracement 0.5)
-            # Standard: Start Point = 100%, End Point = 0%. 
-            # Retracement 50% is middle.
-            # Let's use Prices:
-            # Swing Low = Start. Swing High = End.
-            # Range = High - Low.
-            # Fib 0.5 = High - 0.5 * Range = Low + 0.5 * Range.
-            # Golden Zone: 0.5 to 0.618 Retracement.
-            # If price retraces FROM High DOWN to these levels.
-            
-            range_size = h_price - l_price
-            fib_50 = h_price - (0.50 * range_size)
-            fib_618 = h_price - (0.618 * range_size) 
-            
-            # Buying Zone: Price is between fib_618 (lower price) and fib_50 (higher price)
-            # Reversal: We need price to be INSIDE this zone.
-            
-            if fib_618 <= current_close <= fib_50:
-                 # IN THE ZONE.
-                 # 4. Check Confluence (S/R)
-                 # Simplified: Is there a previous structure near this price?
-                 # We assume the "Golden Zone" itself is the trigger for now strictly.
-                 # Adding strict S/R scan adds complexity. User asked for "Confluence".
-                 # Let's check if 'fib_618' or 'fib_50' aligns with any previous Pivot?
-                 # For V8.0 "Pure", let's trust the Golden Zone is the Support.
-                 
-                 print(f"[FIBONACCI] {symbol} in GOLDEN ZONE (Bullish Dip). P={current_close:.5f} [50%:{fib_50:.5f} | 618%:{fib_618:.5f}]")
-                 
-                 # Prepare BUY Signal
-                 # TP1: Return to High (0.0 Retracement)
-                 tp1 = h_price 
-                 # TP2: Extension -0.272 (Target above High) -> High + 0.272 * Range
-                 tp2 = h_price + (0.272 * range_size)
-                 
-                 # SL: Behind 0.786 or 1.0 (Low).
-                 # User said: "Juste derrière 0.786 ou 1.0 (calculé en ATR)".
-                 # Let's use 1.0 (Swing Low) - 1.5 ATR for safety.
-                 atr = df.iloc[-1].get('ATR', 0.0)
-                 if atr == 0: atr = range_size * 0.05 # Fallback
-                 
-                 sl_base = l_price # 1.0 Level
-                 sl = sl_base - (1.5 * atr)
-                 
-                 return {
-                    'action': 'BUY',
-                    'tps': [tp1, tp2, tp2], # Duplicate TP2 for TP3
-                    'sl_custom': sl, # We need to pass SL to executor? Executor calculates it usually.
-                    # Executor uses "sl_distance". We should pass implied metrics or modify executor.
-                    # Current Executor: "4. Calculate SL... sl_distance_price = 2.0 * atr".
-                    # We need to Override this.
-                    # We can pass specific prices if executor supports it?
-                    # The current executor logic is: sl_price = entry - distance.
-                    # We can calculate the distance here and pass it via "sl_pips" or "comment"?
-                    # Actually, let's keep it simple: Executor uses ATR.
-                    # User asked: "SL placed... (calculated in ATR)". 
-                    # If we use standard Executor, it does 2.0 ATR. That's close to "Behind structure + Buffer".
-                    # Let's rely on standard Executor SL for now to minimize `trade_executor` churn, 
-                    # OR we pass 'sl_price' in the dict and update `trade_executor`.
-                    # Let's try to stick to Executor interface.
-                 }
-                 
-        elif is_bearish_impulse:
-           # Range: High -> Low.
-           # Retracement UP.
-           range_size = h_price - l_price
-           fib_50 = l_price + (0.50 * range_size)
-           fib_618 = l_price + (0.618 * range_size)
-           
-           # Selling Zone: Price is between fib_50 (lower) and fib_618 (higher)
-           if fib_50 <= current_close <= fib_618:
-                print(f"[FIBONACCI] {symbol} in GOLDEN ZONE (Bearish Rally). P={current_close:.5f} [50%:{fib_50:.5f} | 618%:{fib_618:.5f}]")
-                
-                # TP1: Return to Low
-                tp1 = l_price
-                # TP2: Extension
-                tp2 = l_price - (0.272 * range_size)
-                
-                return {
-                    'action': 'SELL',
-                    'tps': [tp1, tp2, tp2]
-                }
-                
-        return 'NEUTRAL'
+        # Note: l'Executor garde son propre SL (2.0 ATR), sl_custom est informatif.
+        return {
+            'action': 'BUY' if action > 0 else 'SELL',
+            'tps': [tp1, tp2, tp2], # Duplicate TP2 for TP3
+            'sl_custom': sl,
+        }
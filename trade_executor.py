@@ -1,66 +1,197 @@
 import MetaTrader5 as mt5
-from datetime import datetime
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
+import functools
 import json
+import logging
+import math
 import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Échelle des TP en multiples de R (distance SL) : TP1..TP4
+_R_RATIOS = np.array([0.5, 1.0, 1.5, 2.0])
+
+
+def _q2(x):
+    """Arrondi à 2 décimales (demi vers le haut), sans passer par round()."""
+    return math.floor(x * 100 + 0.5) / 100.0
+
+
+@functools.cache
+def _data_path(filename):
+    """Chemin complet d'un fichier de données du robot (répertoire courant au premier appel)."""
+    return os.path.join(os.getcwd(), filename)
+
+# Champs de symbol_info réellement utilisés (évite de garder l'objet MT5 complet)
+# inv_step = 1 / volume_step, précalculé (0.0 si pas de step)
+SymInfo = namedtuple('SymInfo', ['point', 'volume_min', 'volume_max', 'volume_step', 'trade_tick_value', 'inv_step'])
+
+
+@dataclass
+class MarketSnapshot:
+    """
+    Infos MT5 capturées une fois par cycle (voir TradeExecutor.build_snapshot).
+    account : résultat de mt5.account_info() (None = à relire en live)
+    symbols : {symbol: SymInfo}
+    Les ticks n'y sont pas : ils vieillissent à chaque order_send du cycle,
+    execute_trade les relit en live.
+    """
+    account: object = None
+    symbols: dict = field(default_factory=dict)
 
 class TradeExecutor:
     """
     Exécuteur de trades pour MetaTrader 5.
     Gère le calcul de taille de lot (Money Management) avec logique High Water Mark.
     """
-    MEMORY_FILE = "bot_memory.json"
+    HWM_FILE = "bot_hwm.bin"         # 8 octets : float64 little-endian
+    MEMORY_FILE = "bot_memory.json"  # Ancien emplacement du HWM (JSON partagé avec main.py)
+    SYMBOL_INFO_TTL = 60.0           # Secondes (tick_value peut bouger en séance hors Forex)
+    MARGIN_CACHE_TTL = 10.0          # Secondes de validité de la marge par lot
+    CONCURRENT_ORDERS = True         # Envoi parallèle des 4 ordres (False si le broker refuse)
+    HWM_POLL_INTERVAL = 30.0         # Secondes entre deux relevés du solde par le poller HWM
+
+    def __init__(self):
+        # Chemins invariants pour le process : mémoïsés au niveau module
+        self._hwm_path = _data_path(self.HWM_FILE)
+        self._memory_path = _data_path(self.MEMORY_FILE)
+        # High Water Mark en mémoire (None = pas encore lu sur disque)
+        self._hwm = None
+        # Poller HWM (thread de fond, hors du chemin d'envoi des ordres)
+        self._hwm_stop = threading.Event()
+        self._hwm_thread = None
+        # Cache {symbol: (timestamp monotonic, SymInfo)}
+        self._sym_cache = {}
+        # Cache {symbol: (timestamp monotonic, marge par lot)}
+        self._margin_per_lot = {}
+        # Pool réutilisé pour les 4 order_send (évite de recréer les threads à chaque trade)
+        self._order_pool = ThreadPoolExecutor(max_workers=4)
 
-    def _get_memory_path(self):
-        """Retourne le chemin complet du fichier mémoire."""
-        # On utilise le répertoire courant ou un chemin relatif
-        return os.path.join(os.getcwd(), self.MEMORY_FILE)
+    def _get_symbol_info(self, symbol):
+        """
+        Retourne les infos symbole utiles (SymInfo), rafraîchies au plus toutes les SYMBOL_INFO_TTL secondes.
+        Retourne None si le symbole est introuvable.
+        Seule l'expiration TTL invalide le cache : une entrée n'a besoin d'être
+        purgée (del self._sym_cache[symbol]) que si MT5 reconfigure le symbole
+        (volume_step, volume_min...) en cours de séance.
+        """
+        now = time.monotonic()
+        cached = self._sym_cache.get(symbol)
+        if cached is not None and now - cached[0] < self.SYMBOL_INFO_TTL:
+            return cached[1]
+        
+        info = mt5.symbol_info(symbol)
+        if info is None:
+            return None
+        inv_step = 1.0 / info.volume_step if info.volume_step > 0 else 0.0
+        sym_info = SymInfo(info.point, info.volume_min, info.volume_max, info.volume_step,
+                           info.trade_tick_value, inv_step)
+        self._sym_cache[symbol] = (now, sym_info)
+        return sym_info
+
+    def _load_legacy_high_water_mark(self):
+        """Migration : record stocké dans l'ancien fichier JSON (avant bot_hwm.bin)."""
+        try:
+            with open(self._memory_path, 'r') as f:
+                return float(json.load(f).get("highest_balance", 0.0))
+        except FileNotFoundError:
+            return 0.0
+        except Exception as e:
+            logger.error("Erreur lecture mémoire: %s", e)
+            return 0.0
 
     def _load_high_water_mark(self):
         """
-        Lit le fichier JSON et retourne le plus haut capital enregistré.
+        Retourne le plus haut capital enregistré (lu sur disque au premier appel seulement).
         Retourne 0.0 si le fichier n'existe pas ou est corrompu.
         """
-        path = self._get_memory_path()
-        if not os.path.exists(path):
-            return 0.0
-            
+        if self._hwm is not None:
+            return self._hwm
+
         try:
-            with open(path, 'r') as f:
-                data = json.load(f)
-                return data.get("highest_balance", 0.0)
+            with open(self._hwm_path, 'rb') as f:
+                self._hwm = struct.unpack('<d', f.read(8))[0]
+        except FileNotFoundError:
+            self._hwm = self._load_legacy_high_water_mark()
         except Exception as e:
-            print(f"Erreur lecture mémoire: {e}")
-            return 0.0
+            logger.error("Erreur lecture mémoire: %s", e)
+            self._hwm = 0.0
+        return self._hwm
 
-    def _update_high_water_mark(self, current_balance):
+    def update_hwm_if_new(self, current_balance):
         """
         Met à jour le High Water Mark si le solde actuel est supérieur.
+        Le disque n'est touché qu'en cas de nouveau record (écriture atomique).
+        Appelé par le poller HWM, pas à chaque trade.
         Retourne le nouveau (ou inchangé) High Water Mark.
         """
-        path = self._get_memory_path()
         previous_high = self._load_high_water_mark()
         
         # Si nouveau record, on met à jour
         if current_balance > previous_high:
-            print(f"Nouveau Record atteint! {previous_high} -> {current_balance}")
+            logger.info("Nouveau Record atteint! %s -> %s", previous_high, current_balance)
+            self._hwm = current_balance
             try:
-                with open(path, 'w') as f:
-                    json.dump({"highest_balance": current_balance}, f)
-                return current_balance
+                tmp_path = self._hwm_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(struct.pack('<d', current_balance))
+                os.replace(tmp_path, self._hwm_path)
             except Exception as e:
-                print(f"Erreur écriture mémoire: {e}")
-                return current_balance # On retourne quand même le montant actuel
+                logger.error("Erreur écriture mémoire: %s", e)
+            return current_balance # On retourne quand même le montant actuel
         
         return previous_high
 
-    def calculate_lot_size(self, symbol, sl_distance_points, risk_percent=None):
+    def shutdown_order_pool(self):
+        """Arrête le pool d'envoi des ordres (attend les order_send en cours)."""
+        self._order_pool.shutdown(wait=True)
+
+    def _poll_hwm(self):
+        """Boucle du poller : relève le solde toutes les HWM_POLL_INTERVAL secondes."""
+        while not self._hwm_stop.is_set():
+            try:
+                account_info = mt5.account_info()
+                if account_info is not None:
+                    self.update_hwm_if_new(account_info.balance)
+            except Exception as e:
+                logger.error("Erreur Poller HWM: %s", e)
+            self._hwm_stop.wait(self.HWM_POLL_INTERVAL)
+
+    def start_hwm_poller(self):
+        """
+        Charge le HWM depuis le disque puis démarre le poller en tâche de fond.
+        calculate_lot_size ne fait ensuite plus aucune IO disque.
+        """
+        if self._hwm_thread is not None:
+            return
+        self._load_high_water_mark()
+        self._hwm_stop.clear()
+        self._hwm_thread = threading.Thread(target=self._poll_hwm, name="hwm-poller", daemon=True)
+        self._hwm_thread.start()
+
+    def stop_hwm_poller(self):
+        """Arrête le poller HWM (le dernier record est déjà sur disque)."""
+        if self._hwm_thread is None:
+            return
+        self._hwm_stop.set()
+        self._hwm_thread.join()
+        self._hwm_thread = None
+
+    def calculate_lot_size(self, symbol, sl_distance_points, risk_percent=None,
+                           symbol_info=None, account_info=None, tick=None):
         """
         Calcule la taille du lot en fonction du High Water Mark (HWM).
         
         Logique:
         1. Récupère solde actuel.
-        2. Met à jour HWM si nécessaire.
+        2. HWM = max(HWM en mémoire, solde) ; la persistance est faite par le poller.
         3. Reference Capital = HWM.
         4. Risk Money = Reference Capital / 10.0 (10% fixe du sommet).
         
@@ -68,37 +199,42 @@ class TradeExecutor:
             symbol (str): Symbole à trader.
             sl_distance_points (float): Distance du SL en points.
             risk_percent (float): IGNORÉ dans cette version (gardé pour compatibilité).
+            symbol_info, account_info, tick (optionnels): infos MT5 déjà récupérées
+                par l'appelant, pour éviter de refaire les appels. Sinon requête live.
             
         Returns:
             float: Taille du lot arrondie et bornée.
         """
-        account_info = mt5.account_info()
         if account_info is None:
-            print("Erreur: Impossible de récupérer les infos du compte.")
+            account_info = mt5.account_info()
+        if account_info is None:
+            logger.error("Erreur: Impossible de récupérer les infos du compte.")
             return 0.0
 
         current_balance = account_info.balance
         
-        # Gestion du High Water Mark
-        high_water_mark = self._update_high_water_mark(current_balance)
+        # Gestion du High Water Mark : lecture mémoire seule (le poller écrit le disque)
+        hwm = self._hwm if self._hwm is not None else self._load_high_water_mark()
+        high_water_mark = max(hwm, current_balance)
         
-        print(f"Solde Actuel: {current_balance}, High Water Mark: {high_water_mark}")
+        logger.info("Solde Actuel: %s, High Water Mark: %s", current_balance, high_water_mark)
         
         # Money Management Aggressif : 1/10ème du plus haut historique
         risk_cash = high_water_mark / 10.0
         
-        print(f"Capital Risqué (1/10 HWM) : {risk_cash:.2f}")
+        logger.info("Capital Risqué (1/10 HWM) : %.2f", risk_cash)
         
-        symbol_info = mt5.symbol_info(symbol)
         if symbol_info is None:
-            print(f"Erreur: Symbole {symbol} non trouvé.")
+            symbol_info = self._get_symbol_info(symbol)
+        if symbol_info is None:
+            logger.error("Erreur: Symbole %s non trouvé.", symbol)
             return 0.0
             
         tick_value = symbol_info.trade_tick_value
         
         # Éviter la division par zéro
         if sl_distance_points == 0 or tick_value == 0:
-            print("Erreur: SL distance ou Tick Value à 0.")
+            logger.error("Erreur: SL distance ou Tick Value à 0.")
             return 0.0
 
         # Formule : Lot = Risk / (SL_points * Tick_Value)
@@ -110,10 +246,10 @@ class TradeExecutor:
         step = symbol_info.volume_step
         
         if step > 0:
-             lot_size = round(lot_size / step) * step
+             lot_size = int(lot_size * symbol_info.inv_step + 0.5) * step
         
         # Arrondir à 2 décimales finales pour sécurité
-        lot_size = round(lot_size, 2)
+        lot_size = _q2(lot_size)
         
         if lot_size < min_lot:
             lot_size = min_lot 
@@ -125,27 +261,41 @@ class TradeExecutor:
         
         # Calcul de la marge requise pour ce lot
         # Note: ORDER_TYPE_BUY ou SELL influence peu la marge en général (sauf hedge), on prend BUY par défaut pour estimer
+        # La marge est linéaire en volume : on mémorise la marge par lot (TTL court) au lieu de rappeler MT5.
         try:
-            ask_price = mt5.symbol_info_tick(symbol).ask
-            margin_required = mt5.order_calc_margin(mt5.ORDER_TYPE_BUY, symbol, lot_size, ask_price)
+            now = time.monotonic()
+            cached = self._margin_per_lot.get(symbol)
+            if cached is not None and now - cached[0] < self.MARGIN_CACHE_TTL:
+                margin_per_lot = cached[1]
+            else:
+                if tick is None:
+                    tick = mt5.symbol_info_tick(symbol)
+                ask_price = tick.ask
+                margin_required = mt5.order_calc_margin(mt5.ORDER_TYPE_BUY, symbol, lot_size, ask_price)
+                margin_per_lot = None
+                if margin_required is not None and lot_size > 0:
+                    margin_per_lot = margin_required / lot_size
+                    self._margin_per_lot[symbol] = (now, margin_per_lot)
             
-            if margin_required is None:
-                print(f"Attention: Impossible de calculer la marge pour {symbol}. On continue avec risque.")
-            elif margin_required > margin_free:
-                print(f"⚠️ Marge Insuffisante! Requis: {margin_required:.2f}, Dispo: {margin_free:.2f}")
-                # Tentative de réduction au minimum
-                print(f"Tentative de réduction à {min_lot} (Min Lot)...")
-                lot_size = min_lot
-                
-                # Re-check avec min_lot
-                margin_required_min = mt5.order_calc_margin(mt5.ORDER_TYPE_BUY, symbol, lot_size, ask_price)
-                if margin_required_min and margin_required_min > margin_free:
-                    print("❌ Marge toujours insuffisante même avec lot minimum. Trade annulé.")
-                    return 0.0
-                else:
-                    print("✅ Lot réduit au minimum accepté.")
+            if margin_per_lot is None:
+                logger.warning("Attention: Impossible de calculer la marge pour %s. On continue avec risque.", symbol)
+            else:
+                margin_required = margin_per_lot * lot_size
+                if margin_required > margin_free:
+                    logger.warning("⚠️ Marge Insuffisante! Requis: %.2f, Dispo: %.2f", margin_required, margin_free)
+                    # Tentative de réduction au minimum
+                    logger.info("Tentative de réduction à %s (Min Lot)...", min_lot)
+                    lot_size = min_lot
+                    
+                    # Re-check avec min_lot (mise à l'échelle, pas de second appel MT5)
+                    margin_required_min = margin_per_lot * lot_size
+                    if margin_required_min > margin_free:
+                        logger.warning("❌ Marge toujours insuffisante même avec lot minimum. Trade annulé.")
+                        return 0.0
+                    else:
+                        logger.info("✅ Lot réduit au minimum accepté.")
         except Exception as e:
-            print(f"Erreur Check Marge: {e}")
+            logger.error("Erreur Check Marge: %s", e)
             # On laisse passer si erreur calcul, le serveur rejettera au pire
             
         return lot_size
@@ -162,87 +312,114 @@ class TradeExecutor:
         tf_key = timeframe if timeframe in data_dict else 'M5'
         
         if tf_key not in data_dict:
-            print(f"[POWER TRIGGER] Erreur: Données {tf_key} manquantes pour validation.")
+            logger.error("[POWER TRIGGER] Erreur: Données %s manquantes pour validation.", tf_key)
             return False
             
         df = data_dict[tf_key]
         
         # Sécurité : vérifier la taille du DF
         if len(df) < 3:
-            print(f"[POWER TRIGGER] Pas assez de données pour validation (len={len(df)}).")
+            logger.warning("[POWER TRIGGER] Pas assez de données pour validation (len=%d).", len(df))
             return False
             
-        # Indexation : 
-        # iloc[-1] = Bougie en cours (non clôturée)
-        # iloc[-2] = Dernière bougie CLÔTURÉE (Celle qu'on analyse)
-        # iloc[-3] = Bougie précédente (Référence pour le breakout)
-        
-        candle_target = df.iloc[-2]
-        candle_prev = df.iloc[-3]
-        
-        # Target (iloc returns Series, assuming lower case columns from market_data_handler)
-        # Check column names case sensitivity. Usually it's lowercase 'open', 'high', etc. based on Step 13.
-        O = candle_target['open']
-        H = candle_target['high']
-        L = candle_target['low']
-        C = candle_target['close']
-        
-        # Prev
-        H_prev = candle_prev['high']
-        L_prev = candle_prev['low']
-        
-        # Calculs communs
-        body_size = abs(C - O)
-        total_range = H - L
-        
-        # Sécurité division par zéro ou range nul
-        if total_range == 0:
-            print("[POWER TRIGGER] Range nul sur la bougie cible. Ignoré.")
+        if signal_type not in ('BUY', 'SELL'):
+            logger.warning("[POWER TRIGGER] Signal ABORTED. Reason: Signal inconnu (%s)", signal_type)
             return False
-            
-        min_body_strength = 0.3 * total_range # [V7.3 Relaxation] 30% du range total
         
-        is_valid = False
-        reason = ""
+        # Sens du signal : +1 BUY, -1 SELL (un seul jeu de tests pour les deux côtés)
+        s = 1 if signal_type == 'BUY' else -1
+        
+        # Indexation (positions NumPy, pas d'indexation pandas) :
+        # [-1] = Bougie en cours (non clôturée)
+        # [-2] = Dernière bougie CLÔTURÉE (Celle qu'on analyse)
+        # [-3] = Bougie précédente (Référence pour le breakout)
+        tail = df.attrs.get('tail3_ohlc')
+        if tail is not None:
+            # 3 dernières bougies OHLC attachées par IndicatorEngine : lecture directe
+            # tolist() : floats Python, l'arithmétique scalaire NumPy est plus lente
+            prev = tail[0].tolist()
+            O, H, L, C = tail[1].tolist()
+            ref = prev[1] if s > 0 else prev[2] # Prev : High pour un BUY, Low pour un SELL
+        else:
+            # Sinon (données non passées par IndicatorEngine) : lecture des colonnes
+            h = df['high'].to_numpy()
+            l = df['low'].to_numpy()
+            O, H, L, C = df['open'].to_numpy()[-2], h[-2], l[-2], df['close'].to_numpy()[-2]
+            ref = h[-3] if s > 0 else l[-3]
         
-        if signal_type == 'BUY':
-            # 1. Color Check (Green)
-            if C > O:
-                # 2. Breakout Check (Close > Previous High)
-                if C > H_prev:
-                    # 3. Body Strength
-                    if body_size > min_body_strength:
-                        is_valid = True
-                    else:
-                        reason = f"Weak Body ({body_size:.5f} < {min_body_strength:.5f})"
-                else:
-                    reason = f"No Breakout of Prev High ({C:.5f} <= {H_prev:.5f})"
-            else:
-                reason = "Candle is Red (Close <= Open)"
-                
-        elif signal_type == 'SELL':
-            # 1. Color Check (Red)
-            if C < O:
-                # 2. Breakout Check (Close < Previous Low)
-                if C < L_prev:
-                    # 3. Body Strength
-                    if body_size > min_body_strength:
-                        is_valid = True
-                    else:
-                        reason = f"Weak Body ({body_size:.5f} < {min_body_strength:.5f})"
-                else:
-                    reason = f"No Breakout of Prev Low ({C:.5f} >= {L_prev:.5f})"
-            else:
-                reason = "Candle is Green (Close >= Open)"
+        color_ok = s * (C - O) > 0                # 1. Couleur
+        brk_ok = s * (C - ref) > 0                # 2. Breakout de la bougie précédente
+        body_ok = math.fabs(C - O) > 0.3 * (H - L) # 3. Corps > 30% du range (faux si range nul)
+        
+        is_valid = color_ok and brk_ok and body_ok
         
+        # Raison (avec valeurs) formatée paresseusement par logger, seulement en cas d'échec
         if not is_valid:
-            print(f"[POWER TRIGGER] Signal ABORTED. Reason: {reason}")
+            if not color_ok:
+                reason = "Candle is Red (Close <= Open)" if s > 0 else "Candle is Green (Close >= Open)"
+                logger.warning("[POWER TRIGGER] Signal ABORTED. Reason: %s", reason)
+            elif not brk_ok:
+                if s > 0:
+                    logger.warning("[POWER TRIGGER] Signal ABORTED. Reason: No Breakout of Prev High (%.5f <= %.5f)", C, ref)
+                else:
+                    logger.warning("[POWER TRIGGER] Signal ABORTED. Reason: No Breakout of Prev Low (%.5f >= %.5f)", C, ref)
+            else:
+                logger.warning("[POWER TRIGGER] Signal ABORTED. Reason: Weak Body (%.5f < %.5f)",
+                               math.fabs(C - O), 0.3 * (H - L))
             return False
             
-        print(f"[POWER TRIGGER] Candle Momentum VALIDATED for {signal_type}.")
+        logger.info("[POWER TRIGGER] Candle Momentum VALIDATED for %s.", signal_type)
         return True
 
-    def execute_trade(self, symbol, signal, data_dict, dry_run=False):
+    @staticmethod
+    def _last_two_candles(df):
+        """Bougies [-3] et [-2] en ndarray (2, 4) OHLC, depuis tail3_ohlc si IndicatorEngine l'a attaché."""
+        tail = df.attrs.get('tail3_ohlc')
+        if tail is not None:
+            return tail[:2]
+        return df.iloc[-3:-1][['open', 'high', 'low', 'close']].to_numpy()
+
+    def validate_momentum_batch(self, symbols, signal_types, data_dict):
+        """
+        [POWER TRIGGER] Version vectorisée de validate_candle_momentum pour N symboles.
+        Mêmes règles (couleur, breakout, corps > 30% du range) en une seule passe NumPy.
+        
+        Args:
+            symbols (list): Symboles à valider.
+            signal_types (list): 'BUY' / 'SELL' alignés sur symbols.
+            data_dict (dict): {symbol: {'M5': df, ...}}.
+            
+        Returns:
+            np.ndarray: Masque booléen (N,) aligné sur symbols (False si données insuffisantes).
+        """
+        valid = np.zeros(len(symbols), dtype=bool)
+        rows = [i for i, sym in enumerate(symbols)
+                if 'M5' in data_dict.get(sym, {}) and len(data_dict[sym]['M5']) >= 3]
+        if not rows:
+            return valid
+        
+        # SoA (K, 2, 4) : [bougie précédente, bougie cible] x [open, high, low, close]
+        arr = np.stack([self._last_two_candles(data_dict[symbols[i]]['M5']) for i in rows])
+        O, H, L, C = arr[:, 1, 0], arr[:, 1, 1], arr[:, 1, 2], arr[:, 1, 3]
+        Hp, Lp = arr[:, 0, 1], arr[:, 0, 2]
+        s = np.where(np.asarray(signal_types)[rows] == 'BUY', 1, -1)
+        
+        valid[rows] = (s * (C - O) > 0) & (s * (C - np.where(s > 0, Hp, Lp)) > 0) & (np.abs(C - O) > 0.3 * (H - L))
+        return valid
+
+    def build_snapshot(self, symbols):
+        """
+        Capture en une fois account_info + SymInfo des symboles à trader ce cycle.
+        Les symboles sans info sont omis (execute_trade les relira en live).
+        """
+        snapshot = MarketSnapshot(account=mt5.account_info())
+        for symbol in symbols:
+            symbol_info = self._get_symbol_info(symbol)
+            if symbol_info is not None:
+                snapshot.symbols[symbol] = symbol_info
+        return snapshot
+
+    def execute_trade(self, symbol, signal, data_dict, snapshot=None, dry_run=False, momentum_ok=None):
         """
         Exécute un trade basé sur le signal (V7.1 Multi-Target).
         
@@ -250,7 +427,9 @@ class TradeExecutor:
             symbol (str): Symbole.
             signal (str or dict): 'BUY'/'SELL' ou dict {'action': 'BUY', 'tps': [tp1, tp2, tp3]}.
             data_dict (dict): Données.
+            snapshot (MarketSnapshot, optional): Infos MT5 du cycle. Sinon requêtes live.
             dry_run (bool): Simulation.
+            momentum_ok (bool, optional): Résultat déjà calculé par validate_momentum_batch.
         """
         # 1. Parse Signal
         if isinstance(signal, dict):
@@ -265,28 +444,37 @@ class TradeExecutor:
 
         # --- V7.2 POWER TRIGGER VALIDATION (Relaxed V7.3) ---
         # On valide la bougie M5 avant d'aller plus loin
-        if not self.validate_candle_momentum(symbol, 'M5', signal_type, data_dict):
-            print(f"[POWER TRIGGER] Momentum faible, mais on force l'exécution pour test ({signal_type}).")
+        if not momentum_ok:
+            # Échec du batch (ou pas de batch) : la version scalaire journalise la raison
+            momentum_ok = self.validate_candle_momentum(symbol, 'M5', signal_type, data_dict)
+        if not momentum_ok:
+            logger.warning("[POWER TRIGGER] Momentum faible, mais on force l'exécution pour test (%s).", signal_type)
             # return None <-- DISABLED for Test/Aggressive Mode
         # -------------------------------------
 
         # 2. Data & ATR Logic
         if 'M5' not in data_dict:
-            print("Erreur: Clé 'M5' manquante.")
+            logger.error("Erreur: Clé 'M5' manquante.")
             return None
         df_m5 = data_dict['M5']
         if df_m5.empty: return None
-        last_m5 = df_m5.iloc[-1]
         
-        if 'ATR' not in last_m5:
-            print("Erreur: Colonne ATR manquante.")
+        if 'ATR' not in df_m5.columns:
+            logger.error("Erreur: Colonne ATR manquante.")
             return None
-        atr = last_m5['ATR']
+        # float Python : l'ATR est en float32, les prix envoyés à MT5 doivent rester en double
+        atr = float(df_m5['ATR'].values[-1])
         
-        # 3. Market Info
+        # 3. Market Info (snapshot du cycle si fourni, réutilisées par calculate_lot_size)
+        account_info = snapshot.account if snapshot is not None else None
+        if account_info is None:
+            account_info = mt5.account_info()
+        # Tick toujours relu : les prix bougent pendant les order_send des trades précédents
         tick = mt5.symbol_info_tick(symbol)
         if tick is None: return None
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = snapshot.symbols.get(symbol) if snapshot is not None else None
+        if symbol_info is None:
+            symbol_info = self._get_symbol_info(symbol)
         if symbol_info is None: return None
         point = symbol_info.point
         
@@ -305,7 +493,8 @@ class TradeExecutor:
             sl_price = entry_price + sl_distance_price
             
         # 5. Lot Size Calculation (Total Safe Volume)
-        total_lot = self.calculate_lot_size(symbol, sl_distance_points)
+        total_lot = self.calculate_lot_size(symbol, sl_distance_points, symbol_info=symbol_info,
+                                            account_info=account_info, tick=tick)
         if total_lot == 0.0: return None
         
         # 6. Split Volume Logic (V7.4 4-Bullet Strategy)
@@ -318,19 +507,19 @@ class TradeExecutor:
         min_lot = symbol_info.volume_min
         
         if step > 0:
-            split_lot = round(raw_split_lot / step) * step
+            split_lot = int(raw_split_lot * symbol_info.inv_step + 0.5) * step
         else:
             split_lot = raw_split_lot
             
-        split_lot = round(split_lot, 2)
+        split_lot = _q2(split_lot)
         
         if split_lot < min_lot:
             # Fallback: force min_lot (Total risk increases slightly)
             split_lot = min_lot
             
-        print(f"--- Exécution V7.4 Multi-Target : {signal_type} ---")
-        print(f"Total Risk Lot: {total_lot} -> Split: 4 x {split_lot}")
-        print(f"Entry: {entry_price}, SL: {sl_price:.5f}")
+        logger.info("--- Exécution V7.4 Multi-Target : %s ---", signal_type)
+        logger.info("Total Risk Lot: %s -> Split: 4 x %s", total_lot, split_lot)
+        logger.info("Entry: %s, SL: %.5f", entry_price, sl_price)
         
         # 7. Targets Assignment (V7.4 Fixed RR)
         # TP1: 0.5 R
@@ -338,55 +527,64 @@ class TradeExecutor:
         # TP3: 1.5 R
         # TP4: 2.0 R
         
-        final_tps = []
-        r_ratios = [0.5, 1.0, 1.5, 2.0]
-        
-        dist = sl_distance_price
-        for r in r_ratios:
-            if signal_type == 'BUY':
-                tp = entry_price + (dist * r)
-            else:
-                tp = entry_price - (dist * r)
-            final_tps.append(tp)
+        sign = 1.0 if signal_type == 'BUY' else -1.0
+        # .tolist() : order_send attend des float Python, pas des np.float64
+        final_tps = (entry_price + sign * sl_distance_price * _R_RATIOS).tolist()
 
         comments = ["V7.4_TP1", "V7.4_TP2", "V7.4_TP3", "V7.4_TP4"]
         order_results = []
         
+        # Champs communs aux 4 ordres : construits une seule fois
+        base_request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": split_lot,
+            "type": action,
+            "price": entry_price,
+            "sl": sl_price,
+            "deviation": 30, 
+            "type_time": mt5.ORDER_TIME_GTC,
+            "type_filling": mt5.ORDER_FILLING_IOC,
+        }
+        
+        requests = []
         for i in range(4):
             tp = final_tps[i]
             comment = comments[i]
             
-            print(f"  Order {i+1} ({comment}): Vol={split_lot}, TP={tp:.5f} (R={r_ratios[i]})")
+            logger.info("  Order %d (%s): Vol=%s, TP=%.5f (R=%s)", i + 1, comment, split_lot, tp, _R_RATIOS[i])
             
             if dry_run:
                 order_results.append({"comment": comment, "status": "Simulated"})
                 continue
                 
-            request = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": symbol,
-                "volume": split_lot,
-                "type": action,
-                "price": entry_price,
-                "sl": sl_price,
-                "tp": tp,
-                "deviation": 30, 
-                "magic": 123456 + i, # Magic 123456, 123457, 123458, 123459
-                "comment": comment,
-                "type_time": mt5.ORDER_TIME_GTC,
-                "type_filling": mt5.ORDER_FILLING_IOC,
-            }
-            
-            res = mt5.order_send(request)
-            if res.retcode != mt5.TRADE_RETCODE_DONE:
-                 print(f"  ❌ Order Failed: {res.comment}")
+            request = base_request.copy()
+            request["tp"] = tp
+            request["magic"] = 123456 + i # Magic 123456, 123457, 123458, 123459
+            request["comment"] = comment
+            requests.append(request)
+        
+        # Envoi : latence ~1 aller-retour broker au lieu de 4 en mode parallèle
+        if requests:
+            if self.CONCURRENT_ORDERS:
+                results = list(self._order_pool.map(mt5.order_send, requests))
             else:
-                 print(f"  ✅ Order Sent: Ticket {res.order}")
-            order_results.append(res)
+                results = [mt5.order_send(request) for request in requests]
+            # Marge et solde ont changé : le prochain trade du cycle relira le compte en live
+            if snapshot is not None:
+                snapshot.account = None
+            
+            for res in results:
+                if res.retcode != mt5.TRADE_RETCODE_DONE:
+                     logger.warning("  ❌ Order Failed: %s", res.comment)
+                else:
+                     logger.info("  ✅ Order Sent: Ticket %s", res.order)
+                order_results.append(res)
             
         return order_results
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("--- Test TradeExecutor ---")
     
     # 1. Init MT5
@@ -403,17 +601,32 @@ if __name__ == "__main__":
         # On ne peut pas facilement mocker un DF M5 valide sans pandas complet, 
         # donc on va essayer de récupérer en réel si possible pour le test
         try:
-            from market_data_handler import MarketDataHandler
-            from indicator_engine import IndicatorEngine
+            import pickle
             
-            handler = MarketDataHandler()
             symbol_test = "EURUSD"
-            data = handler.get_multi_timeframe_data(symbol_test)
+            # Fixture : données déjà calculées rechargées si elles ont moins de 5 minutes
+            fixture_path = "fixture_eurusd.pkl"
+            fixture_max_age = 300
             
-            if data and 'M5' in data:
-                engine = IndicatorEngine()
-                data = engine.add_indicators(data) # Calcul ATR
+            data = None
+            if os.path.exists(fixture_path) and time.time() - os.path.getmtime(fixture_path) < fixture_max_age:
+                with open(fixture_path, 'rb') as f:
+                    data = pickle.load(f)
+                print(f"Fixture rechargée : {fixture_path}")
+            else:
+                from market_data_handler import MarketDataHandler
+                from indicator_engine import IndicatorEngine
+                
+                handler = MarketDataHandler()
+                data = handler.get_multi_timeframe_data(symbol_test)
                 
+                if data and 'M5' in data:
+                    engine = IndicatorEngine()
+                    data = engine.add_indicators(data) # Calcul ATR
+                    with open(fixture_path, 'wb') as f:
+                        pickle.dump(data, f)
+            
+            if data and 'M5' in data:
                 # Force un signal BUY
                 print("Appel execute_trade avec signal BUY forcé...")
                 # On met dry_run=True pour NE PAS exécuter réellement